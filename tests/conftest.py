@@ -0,0 +1,44 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# 设置 DATABASE_URL 时，所有用例再在该数据库（例如 PostgreSQL）上跑一遍；请使用可丢弃的测试库
+EXTERNAL_DATABASE_URL = os.environ.get('DATABASE_URL')
+
+
+def _import_fx_bot(url):
+    """fx_bot 在导入时按 DATABASE_URL 建立连接并执行迁移，因此每个数据库都重新导入一次"""
+    saved = {name: os.environ.get(name) for name in ('DATABASE_URL', 'DATABASE_READ_URL')}
+    os.environ['DATABASE_URL'] = url
+    os.environ.pop('DATABASE_READ_URL', None)
+    sys.modules.pop('fx_bot', None)
+    try:
+        return importlib.import_module('fx_bot')
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@pytest.fixture(scope='session', params=['sqlite', 'database_url'])
+def fx_bot(request, tmp_path_factory):
+    """已执行全部迁移的 fx_bot 模块：临时 SQLite 数据库，以及可选的 DATABASE_URL"""
+    if request.param == 'sqlite':
+        url = f"sqlite:///{tmp_path_factory.mktemp('db') / 'fx_bot.db'}"
+    elif EXTERNAL_DATABASE_URL:
+        url = EXTERNAL_DATABASE_URL
+    else:
+        pytest.skip('未设置 DATABASE_URL')
+    module = _import_fx_bot(url)
+    yield module
+    module.read_engine.dispose()
+    module.engine.dispose()
+    sys.modules.pop('fx_bot', None)
@@ -0,0 +1,74 @@
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+
+
+def _customer(prefix):
+    # 外部数据库可能保留上次运行的数据，客户名每次唯一
+    return f'{prefix}-{uuid.uuid4().hex[:8]}'
+
+
+@contextmanager
+def _captured_sql(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def test_run_migrations_applies_every_version_once(fx_bot):
+    fx_bot.run_migrations()  # 导入时已执行过，再次执行应为空操作
+    with fx_bot.engine.connect() as conn:
+        versions = [row[0] for row in conn.execute(text("SELECT version FROM schema_version"))]
+    assert sorted(versions) == sorted(version for version, _, _ in fx_bot.MIGRATIONS)
+
+
+def test_update_balance_upserts_and_returns_new_amount(fx_bot):
+    customer = _customer('balance')
+    with fx_bot.Session() as session:
+        assert fx_bot.update_balance(session, customer, 'usdt', Decimal('100.25')) == Decimal('100.25')
+        assert fx_bot.update_balance(session, customer, 'USDT', Decimal('50.10')) == Decimal('150.35')
+        session.commit()
+        rows = session.query(fx_bot.Balance).filter_by(customer_name=customer).all()
+    assert [(row.currency, row.amount) for row in rows] == [('USDT', Decimal('150.35'))]
+    assert fx_bot.balance_cache.get(customer, 'USDT') == Decimal('150.35')
+
+
+def test_settle_payment_locks_open_orders(fx_bot):
+    customer = _customer('settle')
+    with fx_bot.Session() as session:
+        order_id = fx_bot._create_trade(
+            session, customer, 'buy', 'MYR', 'USDT', Decimal('4420'), Decimal('4.42'), '/'
+        )
+        with _captured_sql(fx_bot.engine) as statements:
+            fx_bot.settle_payment(session, customer, 'USDT', Decimal('1000'), 'received')
+        order = session.query(fx_bot.Transaction).filter_by(order_id=order_id).one()
+        assert order.settled_in == Decimal('1000.00')
+        assert order.status == 'partial'
+    assert fx_bot.balance_cache.get(customer, 'USDT') == Decimal('0.00')
+    candidates = [sql for sql in statements if 'FROM transactions' in sql and 'quote_currency' in sql]
+    assert candidates
+    # SQLite 没有行锁（写入由数据库锁串行化），其余数据库的候选订单查询必须带 FOR UPDATE
+    assert all(('FOR UPDATE' in sql) != fx_bot.IS_SQLITE for sql in candidates)
+
+
+def test_read_engine_sees_commits_and_rejects_writes(fx_bot):
+    customer = _customer('readonly')
+    with fx_bot.Session() as session:
+        fx_bot.update_balance(session, customer, 'MYR', Decimal('1'))
+        session.commit()
+    with fx_bot.read_engine.connect() as conn:
+        found = conn.execute(text("SELECT name FROM customers WHERE name = :name"), {'name': customer})
+        assert found.scalar_one() == customer
+        with pytest.raises(DBAPIError):
+            conn.execute(text("INSERT INTO customers (name) VALUES (:name)"), {'name': _customer('write')})
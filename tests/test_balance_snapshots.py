@@ -0,0 +1,52 @@
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+
+def _nonzero(balances):
+    return {currency: amount for currency, amount in balances.items() if amount != 0}
+
+
+def _assert_openings_match_ledger(fx_bot, customer, moments):
+    """任意时刻的期初余额 = 从头累计到该时刻的流水"""
+    with fx_bot.Session() as session:
+        for moment in moments:
+            expected, _ = fx_bot.ledger_balances(session, end=moment, customer=customer)
+            recomputed = {currency: amount for (name, currency), amount in expected.items() if name == customer}
+            assert _nonzero(fx_bot.opening_balances(session, customer, moment)) == _nonzero(recomputed), moment
+
+
+def test_opening_balances_match_ledger_around_snapshots(fx_bot):
+    customer = f'snapshot-{uuid.uuid4().hex[:8]}'
+    currency = 'S' + uuid.uuid4().hex[:3].upper()
+    now = datetime.now()
+    with fx_bot.Session() as session:
+        orders = [
+            fx_bot._create_trade(session, customer, transaction_type, currency, 'USD', amount, Decimal('1.10'), '*')
+            for transaction_type, amount in [
+                ('buy', Decimal('1000')), ('sell', Decimal('300')), ('buy', Decimal('500')), ('sell', Decimal('200'))
+            ]
+        ]
+        fx_bot.settle_payment(session, customer, 'USD', Decimal('400'), 'paid')
+        fx_bot.settle_payment(session, customer, currency, Decimal('250'), 'received')
+        payments = [order_id for order_id, in session.query(fx_bot.Transaction.order_id).filter_by(
+            customer_name=customer, transaction_type='payment'
+        ).order_by(fx_bot.Transaction.timestamp)]
+
+        # 通过 ORM 把单据移到过去几天（盈亏日汇总随之更新）
+        days_ago = dict(zip(orders + payments, [6, 4, 2, 0, 5, 3]))
+        for tx in session.query(fx_bot.Transaction).filter(fx_bot.Transaction.order_id.in_(days_ago)):
+            tx.timestamp = now - timedelta(days=days_ago[tx.order_id])
+        session.commit()
+
+        fx_bot.take_balance_snapshot(session, (now - timedelta(days=4)).date())
+        fx_bot.take_balance_snapshot(session, (now - timedelta(days=1)).date())
+
+    day_starts = [datetime.combine((now - timedelta(days=days)).date(), datetime.min.time()) for days in range(8)]
+    moments = day_starts + [now - timedelta(days=days, seconds=1) for days in range(7)] + [now + timedelta(seconds=1)]
+    _assert_openings_match_ledger(fx_bot, customer, moments)
+
+    # 撤销快照之前的支付与订单：快照同步扣除，推算结果仍与流水一致
+    fx_bot._run_in_session(fx_bot._cancel_payment, payments[0])
+    fx_bot._run_in_session(fx_bot._cancel_order, orders[0])
+    _assert_openings_match_ledger(fx_bot, customer, moments)
@@ -0,0 +1,109 @@
+import random
+import uuid
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event, func
+
+
+def _cost_totals(fx_bot, session):
+    totals = {}
+    for currency, (model, amount_field, spent_field) in fx_bot.AVERAGE_COST_RECORDS.items():
+        record = session.query(model).first()
+        totals[currency] = [
+            getattr(record, amount_field) or 0.0 if record else 0.0,
+            getattr(record, spent_field) or 0.0 if record else 0.0,
+        ]
+    return totals
+
+
+def test_import_matches_per_trade_recompute(fx_bot):
+    rng = random.Random(16)
+    customers = [f'import-{uuid.uuid4().hex[:8]}' for _ in range(3)]
+    lot_currency = 'I' + uuid.uuid4().hex[:3].upper()
+    commands = []
+    for _ in range(40):
+        customer = rng.choice(customers)
+        transaction_type = rng.choice(['buy', 'sell'])
+        kind = rng.randrange(3)
+        if kind == 0:
+            commands.append((customer, transaction_type, Decimal(rng.randint(1, 90) * 100), 'MYR', '/', Decimal('4.42'), 'USDT'))
+        elif kind == 1:
+            commands.append((customer, transaction_type, Decimal(rng.randint(1, 90) * 10), 'USDT', '*', Decimal('4.40'), 'MYR'))
+        else:
+            commands.append((customer, transaction_type, Decimal(rng.randint(1, 50) * 100), lot_currency, '*', Decimal('1.10'), 'USD'))
+
+    with fx_bot.Session() as session:
+        before = _cost_totals(fx_bot, session)
+        last_history_id = session.query(func.max(fx_bot.AverageCostHistory.id)).scalar() or 0
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(fx_bot.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        created = fx_bot._run_in_session(fx_bot._import_trades, commands)
+    finally:
+        event.remove(fx_bot.engine, 'before_cursor_execute', before_cursor_execute)
+    assert [customer for _, customer in created] == [command[0] for command in commands]
+    # 整批每个均价币种只读取（锁定）一次均价记录
+    for currency, (model, _, _) in fx_bot.AVERAGE_COST_RECORDS.items():
+        assert sum(f'FROM {model.__tablename__}' in sql for sql in statements) == 1
+
+    with fx_bot.Session() as session:
+        # 余额 = 按流水全量重算
+        for customer in customers:
+            expected, _ = fx_bot.ledger_balances(session, customer=customer)
+            recorded = {
+                (row.customer_name, row.currency): row.amount
+                for row in session.query(fx_bot.Balance).filter_by(customer_name=customer)
+            }
+            assert recorded == {key: amount for key, amount in expected.items() if key[0] == customer}
+
+        # 均价历史 = 从批次前的累计值按录入顺序逐笔推进
+        order_ids = [order_id for order_id, _ in created]
+        trades = {
+            tx.order_id: tx for tx in session.query(fx_bot.Transaction).filter(fx_bot.Transaction.order_id.in_(order_ids))
+        }
+        expected_history = []
+        for order_id in order_ids:
+            change = fx_bot.average_cost_change(trades[order_id])
+            if change is None:
+                continue
+            currency, received, spent = change
+            totals = before[currency]
+            totals[0] += received
+            totals[1] += spent
+            expected_history.append((currency, order_id, totals[0], totals[1], totals[1] / totals[0] if totals[0] > 0 else 0.0))
+        history = session.query(fx_bot.AverageCostHistory).filter(
+            fx_bot.AverageCostHistory.id > last_history_id
+        ).order_by(fx_bot.AverageCostHistory.id).all()
+        assert [(row.currency, row.order_id) for row in history] == [row[:2] for row in expected_history]
+        for row, expected in zip(history, expected_history):
+            assert (row.total_amount, row.total_spent, row.average_cost) == pytest.approx(expected[2:])
+
+        # 均价记录 = 各币种最后一条历史
+        for currency, (model, amount_field, spent_field) in fx_bot.AVERAGE_COST_RECORDS.items():
+            last = [row for row in history if row.currency == currency][-1]
+            record = session.query(model).one()
+            assert (getattr(record, amount_field), getattr(record, spent_field), record.average_cost) == pytest.approx(
+                (last.total_amount, last.total_spent, last.average_cost)
+            )
+
+    # 订单匹配 = 全量重新匹配
+    def lot_state(session):
+        return (
+            sorted((m.buy_order_id, m.sell_order_id, round(m.amount, 6))
+                   for m in session.query(fx_bot.LotMatch).filter_by(base_currency=lot_currency)),
+            sorted((lot.order_id, lot.side, round(lot.remaining, 6))
+                   for lot in session.query(fx_bot.LotQueue).filter_by(base_currency=lot_currency)),
+        )
+
+    with fx_bot.Session() as session:
+        state = lot_state(session)
+        fx_bot.rebuild_lot_matches(session, [lot_currency])
+        session.flush()
+        assert state == lot_state(session)
+        session.rollback()
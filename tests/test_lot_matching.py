@@ -0,0 +1,50 @@
+import random
+import string
+import uuid
+from decimal import Decimal
+
+
+def _lot_state(fx_bot, session, currency):
+    matches = sorted(
+        (match.buy_order_id, match.sell_order_id, round(match.amount, 6))
+        for match in session.query(fx_bot.LotMatch).filter_by(base_currency=currency)
+    )
+    queue = sorted(
+        (lot.order_id, lot.side, round(lot.remaining, 6))
+        for lot in session.query(fx_bot.LotQueue).filter_by(base_currency=currency)
+    )
+    return matches, queue
+
+
+def _rebuilt_lot_state(fx_bot, currency):
+    """全量重新匹配该基础币的全部订单（不提交）"""
+    with fx_bot.Session() as session:
+        fx_bot.rebuild_lot_matches(session, [currency])
+        session.flush()
+        state = _lot_state(fx_bot, session, currency)
+        session.rollback()
+    return state
+
+
+def test_cancel_and_delete_match_full_rebuild(fx_bot):
+    rng = random.Random(5)
+    currency = 'L' + ''.join(rng.choice(string.ascii_uppercase) for _ in range(3))
+    customers = [f'lots-{uuid.uuid4().hex[:8]}' for _ in range(3)]
+    orders = []
+    with fx_bot.Session() as session:
+        for _ in range(30):
+            orders.append(fx_bot._create_trade(
+                session, rng.choice(customers), rng.choice(['buy', 'sell']), currency, 'USD',
+                Decimal(rng.randint(1, 50) * 100), Decimal('1.10'), '*'
+            ))
+
+    for order_id in rng.sample(orders, 6):
+        fx_bot._run_in_session(fx_bot._cancel_order, order_id)
+        with fx_bot.Session() as session:
+            assert _lot_state(fx_bot, session, currency) == _rebuilt_lot_state(fx_bot, currency)
+
+    fx_bot._run_in_session(fx_bot._delete_customer, customers[0])
+    with fx_bot.Session() as session:
+        state = _lot_state(fx_bot, session, currency)
+    assert state == _rebuilt_lot_state(fx_bot, currency)
+    assert state[0]  # 仍有匹配记录
@@ -0,0 +1,61 @@
+import asyncio
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+
+
+def _customer(prefix):
+    return f'{prefix}-{uuid.uuid4().hex[:8]}'
+
+
+def _update(message_id):
+    return SimpleNamespace(effective_chat=SimpleNamespace(id=1), message=SimpleNamespace(message_id=message_id))
+
+
+def _pay(fx_bot, update, customer, reference=None):
+    return asyncio.run(fx_bot.process_payment(
+        update, customer, 'USDT', Decimal('1000.00'), 'received', reference
+    ))
+
+
+def _payments(fx_bot, customer):
+    with fx_bot.Session() as session:
+        return [
+            (tx.order_id, tx.status)
+            for tx in session.query(fx_bot.Transaction).filter_by(customer_name=customer, transaction_type='payment')
+            .order_by(fx_bot.Transaction.order_id)
+        ]
+
+
+def _create_buy(fx_bot, customer):
+    with fx_bot.Session() as session:
+        fx_bot._create_trade(session, customer, 'buy', 'MYR', 'USDT', Decimal('4420'), Decimal('4.42'), '/')
+
+
+def test_redelivered_message_replays_first_result(fx_bot):
+    customer = _customer('redeliver')
+    _create_buy(fx_bot, customer)
+    update = _update(uuid.uuid4().int % 10 ** 9)
+
+    first = _pay(fx_bot, update, customer)
+    assert _pay(fx_bot, update, customer) == "♻️ 重复指令，未再次结算，以下为首次处理结果：\n" + first
+    fx_bot.payment_request_cache.discard([fx_bot.payment_request_key(update, customer)])  # 模拟重启：只剩数据库记录
+    assert _pay(fx_bot, update, customer).startswith("♻️")
+
+    assert len(_payments(fx_bot, customer)) == 1
+    assert fx_bot.balance_cache.get(customer, 'USDT') == Decimal('0.00')
+
+
+def test_reference_is_reusable_after_cancel(fx_bot):
+    customer = _customer('cancel')
+    _create_buy(fx_bot, customer)
+
+    assert _pay(fx_bot, _update(1), customer, 'BANK-1').startswith("✅")
+    assert _pay(fx_bot, _update(2), customer, 'BANK-1').startswith("♻️")
+    [(order_id, _)] = _payments(fx_bot, customer)
+    assert fx_bot._run_in_session(fx_bot._cancel_payment, order_id).startswith("✅")
+
+    assert _pay(fx_bot, _update(3), customer, 'BANK-1').startswith("✅")
+    statuses = [status for _, status in _payments(fx_bot, customer)]
+    assert sorted(statuses) == ['-', 'canceled']
+    assert fx_bot.balance_cache.get(customer, 'USDT') == Decimal('0.00')
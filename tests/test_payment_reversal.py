@@ -0,0 +1,99 @@
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+from types import SimpleNamespace
+
+
+def _order_state(fx_bot, session, customer):
+    return {
+        tx.order_id: (fx_bot.to_money(tx.settled_in), fx_bot.to_money(tx.settled_out), tx.status)
+        for tx in session.query(fx_bot.Transaction).filter(
+            fx_bot.Transaction.customer_name == customer,
+            fx_bot.Transaction.transaction_type.in_(['buy', 'sell'])
+        )
+    }
+
+
+def _recomputed_state(fx_bot, session, customer):
+    """按未撤销支付的结算分配从零重算订单的结算金额与状态"""
+    orders = {
+        tx.order_id: tx for tx in session.query(fx_bot.Transaction).filter(
+            fx_bot.Transaction.customer_name == customer,
+            fx_bot.Transaction.transaction_type.in_(['buy', 'sell'])
+        )
+    }
+    active = session.query(fx_bot.Transaction.order_id).filter(
+        fx_bot.Transaction.transaction_type == 'payment', fx_bot.Transaction.status != 'canceled'
+    )
+    settled = defaultdict(Decimal)
+    for allocation in session.query(fx_bot.PaymentAllocation).filter(
+        fx_bot.PaymentAllocation.order_id.in_(orders),
+        fx_bot.PaymentAllocation.payment_order_id.in_(active)
+    ):
+        settled[(allocation.order_id, allocation.side)] += allocation.amount
+    state = {}
+    for order_id, tx in orders.items():
+        settled_in, settled_out = settled[(order_id, 'in')], settled[(order_id, 'out')]
+        recomputed = SimpleNamespace(
+            transaction_type=tx.transaction_type, amount=tx.amount, rate=tx.rate, operator=tx.operator,
+            settled_in=settled_in, settled_out=settled_out
+        )
+        if fx_bot.is_fully_settled(recomputed):
+            status = 'settled'
+        elif settled_in > 0 or settled_out > 0:
+            status = 'partial'
+        else:
+            status = 'pending'
+        state[order_id] = (settled_in, settled_out, status)
+    return state
+
+
+def _balances(fx_bot, session, customer):
+    return {
+        row.currency: row.amount
+        for row in session.query(fx_bot.Balance).filter_by(customer_name=customer)
+    }
+
+
+def _assert_matches_recompute(fx_bot, session, customer):
+    assert _order_state(fx_bot, session, customer) == _recomputed_state(fx_bot, session, customer)
+    expected, _ = fx_bot.ledger_balances(session, customer=customer)
+    assert _balances(fx_bot, session, customer) == {
+        currency: amount for (name, currency), amount in expected.items() if name == customer
+    }
+
+
+def test_cancel_payment_restores_orders_from_remaining_allocations(fx_bot):
+    customer = f'reverse-{uuid.uuid4().hex[:8]}'
+    with fx_bot.Session() as session:
+        fx_bot._create_trade(session, customer, 'buy', 'MYR', 'USDT', Decimal('4420'), Decimal('4.42'), '/')
+        fx_bot._create_trade(session, customer, 'buy', 'MYR', 'USDT', Decimal('2210'), Decimal('4.42'), '/')
+        fx_bot._create_trade(session, customer, 'sell', 'MYR', 'USDT', Decimal('884'), Decimal('4.42'), '/')
+        before_payments = _order_state(fx_bot, session, customer)
+        balances_before = _balances(fx_bot, session, customer)
+
+        for currency, amount, direction in [
+            ('USDT', Decimal('600'), 'received'),
+            ('USDT', Decimal('500'), 'received'),
+            ('MYR', Decimal('3000'), 'paid'),
+            ('USDT', Decimal('450'), 'received'),
+        ]:
+            fx_bot.settle_payment(session, customer, currency, amount, direction)
+        _assert_matches_recompute(fx_bot, session, customer)
+
+        payments = [order_id for order_id, in session.query(fx_bot.Transaction.order_id).filter_by(
+            customer_name=customer, transaction_type='payment'
+        ).order_by(fx_bot.Transaction.timestamp)]
+        assert len(payments) == 4
+
+        # 撤销中间的一笔：其余支付的分配保持不变
+        fx_bot._cancel_payment(session, payments[1])
+        _assert_matches_recompute(fx_bot, session, customer)
+
+        for order_id in (payments[3], payments[0], payments[2]):
+            fx_bot._cancel_payment(session, order_id)
+            _assert_matches_recompute(fx_bot, session, customer)
+
+        # 全部撤销后订单与余额回到支付前的状态
+        assert _order_state(fx_bot, session, customer) == before_payments
+        assert _balances(fx_bot, session, customer) == balances_before
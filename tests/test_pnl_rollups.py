@@ -0,0 +1,53 @@
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+
+def _pnl_report():
+    return defaultdict(lambda: defaultdict(float))
+
+
+def _assert_rollups_match_scan(fx_bot):
+    with fx_bot.Session() as session:
+        rolled = _pnl_report()
+        counts = fx_bot._sum_pnl_rollups(session, date(2000, 1, 1), date(2100, 1, 1), rolled)
+        scanned = _pnl_report()
+        txs, expenses = fx_bot._scan_pnl(session, datetime(2000, 1, 1), datetime(2100, 1, 1), scanned)
+    assert counts == (len(txs), len(expenses))
+    for currency in rolled.keys() | scanned.keys():
+        for key in fx_bot.PNL_FIELDS:
+            assert rolled[currency][key] == pytest.approx(scanned[currency][key], abs=1e-6), (currency, key)
+
+
+def test_rollups_match_raw_scan_after_every_kind_of_change(fx_bot):
+    customers = [f'pnl-{uuid.uuid4().hex[:8]}' for _ in range(2)]
+    with fx_bot.Session() as session:
+        buy = fx_bot._create_trade(session, customers[0], 'buy', 'MYR', 'USDT', Decimal('4420'), Decimal('4.42'), '/')
+        sell = fx_bot._create_trade(session, customers[0], 'sell', 'USDT', 'MYR', Decimal('300'), Decimal('4.40'), '*')
+        fx_bot._create_trade(session, customers[1], 'buy', 'USDT', 'MYR', Decimal('500'), Decimal('4.45'), '*')
+        # 改到前一天：汇总随时间变化在两天之间转移
+        tx = session.query(fx_bot.Transaction).filter_by(order_id=sell).one()
+        tx.timestamp -= timedelta(days=1)
+        session.commit()
+    _assert_rollups_match_scan(fx_bot)
+
+    # 结算（订单结算金额变化）、撤销支付（逆向恢复）
+    with fx_bot.Session() as session:
+        fx_bot.settle_payment(session, customers[0], 'USDT', Decimal('600'), 'received')
+        fx_bot.settle_payment(session, customers[0], 'MYR', Decimal('4420'), 'paid')
+        payment = session.query(fx_bot.Transaction).filter_by(
+            customer_name=customers[0], transaction_type='payment', sub_type='公司支付'
+        ).one().order_id
+    _assert_rollups_match_scan(fx_bot)
+    fx_bot._run_in_session(fx_bot._cancel_payment, payment)
+    _assert_rollups_match_scan(fx_bot)
+
+    # 支出、撤销订单、删除客户（批量删除）
+    fx_bot._run_in_session(fx_bot._record_expense, Decimal('100'), 'MYR', 'rent')
+    fx_bot._run_in_session(fx_bot._cancel_order, buy)
+    _assert_rollups_match_scan(fx_bot)
+    fx_bot._run_in_session(fx_bot._delete_customer, customers[1])
+    _assert_rollups_match_scan(fx_bot)
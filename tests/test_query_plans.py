@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.fixture
+def sqlite_fx_bot(fx_bot):
+    if not fx_bot.IS_SQLITE:
+        pytest.skip('查询计划检查仅支持 SQLite')
+    return fx_bot
+
+
+def test_hot_queries_use_expected_indexes(sqlite_fx_bot):
+    with sqlite_fx_bot.engine.connect() as conn:
+        assert sqlite_fx_bot.check_query_plans(conn) == []
+
+
+def test_migrations_create_every_hot_query_index(sqlite_fx_bot):
+    with sqlite_fx_bot.engine.connect() as conn:
+        indexes = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {index for _, index in sqlite_fx_bot.HOT_QUERIES.values()} <= indexes
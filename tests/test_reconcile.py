@@ -0,0 +1,55 @@
+import uuid
+from decimal import Decimal
+
+
+def _customer(prefix):
+    return f'{prefix}-{uuid.uuid4().hex[:8]}'
+
+
+def _drifts(fx_bot, customers):
+    drifts, _ = fx_bot._run_in_session(fx_bot._reconcile_balances)
+    return [drift for drift in drifts if drift[0] in customers]
+
+
+def test_reconcile_after_delete_customer(fx_bot):
+    customer = _customer('deleted')
+    with fx_bot.Session() as session:
+        fx_bot._create_trade(session, customer, 'buy', 'MYR', 'USDT', Decimal('4420'), Decimal('4.42'), '/')
+    fx_bot._run_in_session(fx_bot._delete_customer, customer)
+
+    with fx_bot.Session() as session:
+        assert session.query(fx_bot.Balance).filter(fx_bot.Balance.customer_name.is_(None)).count() == 0
+    assert _drifts(fx_bot, {customer, None}) == []
+
+
+def test_reconcile_reports_and_repairs_orphan_balances(fx_bot):
+    with fx_bot.Session() as session:
+        session.execute(fx_bot.Balance.__table__.insert().values(customer_name=None, currency='USDT', amount=5))
+        session.commit()
+
+    drifts = _drifts(fx_bot, {None})
+    assert drifts == [(None, 'USDT', Decimal('5.00'), Decimal('0.00'))]
+    fx_bot._run_in_session(fx_bot._repair_balances, drifts)
+    assert _drifts(fx_bot, {None}) == []
+
+
+def test_reconcile_reports_and_repairs_drift(fx_bot):
+    customer = _customer('drift')
+    with fx_bot.Session() as session:
+        fx_bot._create_trade(session, customer, 'buy', 'MYR', 'USDT', Decimal('4420'), Decimal('4.42'), '/')
+        fx_bot.settle_payment(session, customer, 'USDT', Decimal('600'), 'received')
+    assert _drifts(fx_bot, {customer}) == []
+
+    # 绕过 update_balance 直接改写余额行，模拟余额表与流水不一致
+    table = fx_bot.Balance.__table__
+    with fx_bot.Session() as session:
+        session.execute(table.update().where(
+            table.c.customer_name == customer, table.c.currency == 'USDT'
+        ).values(amount=table.c.amount + 7.5))
+        session.commit()
+
+    drifts = _drifts(fx_bot, {customer})
+    assert drifts == [(customer, 'USDT', Decimal('-392.50'), Decimal('-400.00'))]
+    fx_bot._run_in_session(fx_bot._repair_balances, drifts)
+    assert _drifts(fx_bot, {customer}) == []
+    assert fx_bot.balance_cache.get(customer, 'USDT') == Decimal('-400.00')
@@ -0,0 +1,13 @@
+def test_render_table_pages_splits_rows_into_album_batches(fx_bot):
+    columns = [fx_bot.TableColumn("序号", 80), fx_bot.TableColumn("内容", 120)]
+    rows = [fx_bot.TableRow([str(i), "x" * (i % 7)]) for i in range(23)]
+
+    result = fx_bot.render_table_pages("标题", "副标题", columns, rows, page_rows=1)
+
+    assert len(result.pages) == fx_bot.TELEGRAM_MEDIA_GROUP_SIZE
+    assert [len(batch.rows) for batch in result.remaining] == [10, 3]
+    assert [batch.first_page for batch in result.remaining] == [10, 20]
+    # 后续批次只带本批数据行，列宽沿用按全部数据计算的结果
+    widths = fx_bot.table_column_widths(columns, rows)
+    assert all(batch.widths == widths for batch in result.remaining)
+    assert [len(fx_bot.render_table_batch(batch)) for batch in result.remaining] == [10, 3]
@@ -0,0 +1,66 @@
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+
+def _orders(fx_bot, session, customer):
+    return {
+        tx.order_id: tx for tx in session.query(fx_bot.Transaction).filter(
+            fx_bot.Transaction.customer_name == customer,
+            fx_bot.Transaction.transaction_type.in_(['buy', 'sell'])
+        )
+    }
+
+
+def _assert_consistent(fx_bot, customer):
+    """订单结算金额 = 结算分配之和，状态与结算金额一致，余额 = 按流水重算的余额"""
+    with fx_bot.Session() as session:
+        orders = _orders(fx_bot, session, customer)
+        allocated = defaultdict(Decimal)
+        for allocation in session.query(fx_bot.PaymentAllocation).filter(
+            fx_bot.PaymentAllocation.order_id.in_(orders)
+        ):
+            allocated[(allocation.order_id, allocation.side)] += allocation.amount
+        for order_id, tx in orders.items():
+            assert fx_bot.to_money(tx.settled_in) == allocated[(order_id, 'in')]
+            assert fx_bot.to_money(tx.settled_out) == allocated[(order_id, 'out')]
+            assert (tx.status == 'settled') == fx_bot.is_fully_settled(tx)
+
+        expected, _ = fx_bot.ledger_balances(session, customer=customer)
+        recorded = {
+            (row.customer_name, row.currency): row.amount
+            for row in session.query(fx_bot.Balance).filter_by(customer_name=customer)
+        }
+    assert recorded == {key: amount for key, amount in expected.items() if key[0] == customer}
+    assert all(fx_bot.balance_cache.get(*key) == amount for key, amount in recorded.items())
+
+
+def test_received_settles_open_orders_fifo(fx_bot):
+    customer = f'fifo-{uuid.uuid4().hex[:8]}'
+    with fx_bot.Session() as session:
+        first = fx_bot._create_trade(session, customer, 'buy', 'MYR', 'USDT', Decimal('4420'), Decimal('4.42'), '/')
+        second = fx_bot._create_trade(session, customer, 'buy', 'MYR', 'USDT', Decimal('2210'), Decimal('4.42'), '/')
+        fx_bot.settle_payment(session, customer, 'USDT', Decimal('1200'), 'received')
+        orders = _orders(fx_bot, session, customer)
+        assert (orders[first].settled_in, orders[first].status) == (Decimal('1000.00'), 'partial')
+        assert (orders[second].settled_in, orders[second].status) == (Decimal('200.00'), 'partial')
+    _assert_consistent(fx_bot, customer)
+
+    # 公司付清两笔订单的 MYR，超出部分直接记入余额
+    with fx_bot.Session() as session:
+        fx_bot.settle_payment(session, customer, 'USDT', Decimal('400'), 'received')
+        fx_bot.settle_payment(session, customer, 'MYR', Decimal('7000'), 'paid')
+        orders = _orders(fx_bot, session, customer)
+        assert orders[first].status == orders[second].status == 'settled'
+    assert fx_bot.balance_cache.get(customer, 'USDT') == Decimal('100.00')
+    assert fx_bot.balance_cache.get(customer, 'MYR') == Decimal('-370.00')
+    _assert_consistent(fx_bot, customer)
+
+
+def test_received_hedges_sell_orders_before_settling_buys(fx_bot):
+    customer = f'hedge-{uuid.uuid4().hex[:8]}'
+    with fx_bot.Session() as session:
+        fx_bot._create_trade(session, customer, 'buy', 'MYR', 'USDT', Decimal('4420'), Decimal('4.42'), '/')
+        fx_bot._create_trade(session, customer, 'sell', 'MYR', 'USDT', Decimal('1105'), Decimal('4.42'), '/')
+        fx_bot.settle_payment(session, customer, 'USDT', Decimal('500'), 'received')
+    _assert_consistent(fx_bot, customer)